@@ -0,0 +1,39 @@
+"""
+Script offline: exporta modelo_cardiovascular.h5 a ONNX y lo cuantiza
+dinámicamente a INT8 (modelo_cardiovascular.int8.onnx).
+
+Se ejecuta una sola vez antes del deploy:
+
+    python convertir_onnx.py
+
+Requiere tf2onnx y onnxruntime (solo para la conversión; en producción
+basta con onnxruntime). ONNX Runtime usa los kernels int8 de MLAS
+(AVX2/AVX-512 VNNI) y tiene mucho menos overhead por llamada que Keras.
+"""
+import tensorflow as tf
+import tf2onnx
+from onnxruntime.quantization import QuantType, quantize_dynamic
+
+MODEL_H5 = 'modelo_cardiovascular.h5'
+MODEL_ONNX = 'modelo_cardiovascular.onnx'
+MODEL_ONNX_INT8 = 'modelo_cardiovascular.int8.onnx'
+
+
+def main():
+    model = tf.keras.models.load_model(MODEL_H5)
+
+    # tf2onnx no entiende los tensores de Keras 3 directamente, así que
+    # exportamos a través de una tf.function con firma fija.
+    infer = tf.function(lambda x: model(x, training=False))
+    spec = (tf.TensorSpec((None, 8), tf.float32, name='input'),)
+    tf2onnx.convert.from_function(
+        infer, input_signature=spec, opset=17, output_path=MODEL_ONNX
+    )
+
+    quantize_dynamic(MODEL_ONNX, MODEL_ONNX_INT8, weight_type=QuantType.QInt8)
+
+    print(f"✅ Modelo exportado: {MODEL_ONNX} y cuantizado: {MODEL_ONNX_INT8}")
+
+
+if __name__ == '__main__':
+    main()
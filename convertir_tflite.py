@@ -0,0 +1,62 @@
+"""
+Script offline: convierte modelo_cardiovascular.h5 a FlatBuffers TFLite.
+
+Se ejecuta una sola vez antes del deploy:
+
+    python convertir_tflite.py
+
+Genera dos variantes:
+  - modelo_cardiovascular.fp32.tflite: sin cuantizar; el delegado XNNPACK
+    (activo por defecto) usa micro-kernels FMA para los Dense y reproduce
+    la salida de Keras exacta. Es la que el servidor prefiere.
+  - modelo_cardiovascular.tflite: cuantizada a INT8 (~4x menos peso, con
+    un pequeño error de cuantización). La entrada/salida se mantienen en
+    float32 para no tocar el código de la API.
+"""
+import numpy as np
+import tensorflow as tf
+
+MODEL_H5 = 'modelo_cardiovascular.h5'
+MODEL_TFLITE = 'modelo_cardiovascular.tflite'
+MODEL_TFLITE_FP32 = 'modelo_cardiovascular.fp32.tflite'
+
+
+def representative_dataset():
+    """Genera muestras representativas para calibrar la cuantización.
+
+    El modelo consume datos ya estandarizados por el StandardScaler,
+    así que filas ~N(0,1) cubren el rango real de activaciones.
+    """
+    rng = np.random.default_rng(42)
+    for _ in range(100):
+        yield [rng.standard_normal((1, 8)).astype(np.float32)]
+
+
+def main():
+    model = tf.keras.models.load_model(MODEL_H5)
+
+    # Variante fp32: sin flags de optimización, solo el plegado de grafo
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    tflite_fp32 = converter.convert()
+    with open(MODEL_TFLITE_FP32, 'wb') as f:
+        f.write(tflite_fp32)
+    print(f"✅ Modelo convertido: {MODEL_TFLITE_FP32} ({len(tflite_fp32)} bytes)")
+
+    # Variante INT8
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    # float32 en los bordes: la API sigue mandando/recibiendo float32
+    converter.inference_input_type = tf.float32
+    converter.inference_output_type = tf.float32
+
+    tflite_model = converter.convert()
+    with open(MODEL_TFLITE, 'wb') as f:
+        f.write(tflite_model)
+
+    print(f"✅ Modelo convertido: {MODEL_TFLITE} ({len(tflite_model)} bytes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Script offline: extrae los pesos del modelo Keras a un .npz plano
+(modelo_cardiovascular.npz) para poder hacer la inferencia con NumPy puro,
+sin importar TensorFlow en el servidor.
+
+Se ejecuta una sola vez antes del deploy:
+
+    python exportar_pesos.py
+
+El forward del modelo es solo Dense(relu) → Dense(relu) → Dense(sigmoid),
+así que dos matmuls chicos + sigmoide reproducen model.predict exacto.
+"""
+import numpy as np
+import tensorflow as tf
+
+MODEL_H5 = 'modelo_cardiovascular.h5'
+PESOS_NPZ = 'modelo_cardiovascular.npz'
+
+
+def main():
+    model = tf.keras.models.load_model(MODEL_H5)
+
+    densas = [l for l in model.layers if isinstance(l, tf.keras.layers.Dense)]
+    activaciones = [l.activation.__name__ for l in densas]
+    # El forward de app.py asume esta arquitectura exacta
+    assert activaciones == ['relu', 'relu', 'sigmoid'], activaciones
+
+    (W1, b1), (W2, b2), (W3, b3) = [l.get_weights() for l in densas]
+    np.savez(
+        PESOS_NPZ,
+        W1=W1.astype(np.float32), b1=b1.astype(np.float32),
+        W2=W2.astype(np.float32), b2=b2.astype(np.float32),
+        W3=W3.astype(np.float32), b3=b3.astype(np.float32),
+    )
+    print(f"✅ Pesos exportados: {PESOS_NPZ}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,14 @@
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+timeout = 180
+
+# Los recursos se cargan una vez en el proceso padre (app.py los carga al
+# importar) y los workers comparten los pesos por copy-on-write.
+preload_app = True
+
+# Un worker por núcleo con algunos hilos cada uno: la inferencia es de
+# microsegundos, así que la concurrencia vive en la capa HTTP.
+workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+worker_class = 'gthread'
+threads = 4